@@ -1,33 +1,93 @@
 from datetime import datetime
 from abc import ABC, abstractmethod
+from enum import Enum
 from pathlib import Path
-import json, os
+import functools
+import json
+import logging
 from typing import Any, Iterable, Sequence
 
 from packageurl import PackageURL
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import mobster.sbom.merge as merge 
 from mobster.sbom.merge import CDXComponent, SBOMItem, SPDXPackage
 
-@dataclass
+LOGGER = logging.getLogger(__name__)
+
+_SCRIPT_DIR = Path(__file__).resolve().parent
+_SPDX_MAP_PATH = str(_SCRIPT_DIR / "enrich_tools" / "SPDXmappings2.3.json")
+_SPDX_AI_MAP_PATH = str(_SCRIPT_DIR / "enrich_tools" / "SPDXmappingAI.json")
+
+# model card fields that are never copied into the enriched SPDX package:
+# bomFormat doesn't go in SPDX and serialNumber gets rebuilt as the SPDX id,
+# specVersion doesn't matter because we're using the SPDX version of the original
+_PREFER_ORIGINAL_FIELDS = frozenset(
+    {
+        "bomFormat",
+        "serialNumber",
+        "specVersion",
+        "external_references",
+        "downloadLocation",
+        "version",
+    }
+)
+
+
+class SBOMType(Enum):
+    """
+    Enumeration of the SBOM formats an enrichment input can have.
+    """
+
+    CYCLONEDX = "cyclonedx"
+    SPDX = "spdx"
+
+
+@functools.cache
+def _load_mapping(file_path: str) -> dict[str, Any]:
+    """
+    Load a field mapping file. The parsed mapping is cached, so each
+    file is read only once per process.
+
+    Args:
+        file_path: Path to the JSON mapping file
+    Returns:
+        dict[str, Any]: The parsed mapping
+    """
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)  # type: ignore[no-any-return]
+
+@dataclass(slots=True)
 class SBOMElement(SBOMItem):
+    """
+    Class representing an element of a plain JSON enrichment file.
+    """
+
     data: dict[str,Any]
+    _purl: PackageURL | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _purl_parsed: bool = field(default=False, init=False, repr=False, compare=False)
 
     def id(self) -> str:
         """No-op since this is a not an actual SBOM."""
+        return ""
 
     def name(self) -> str:
         """Get the name of the SBOM item."""
-        self.data["name"]
+        return self.data["name"]  # type: ignore
 
     def version(self) -> str:
         """No-op since this is a not an actual SBOM."""
+        return ""
 
     def purl(self) -> PackageURL | None:
-        if purl_str := self.data.get("purl"):
-            return merge.try_parse_purl(purl_str)
-        return None
+        """Get the Package URL of the element, parsed on first access."""
+        if not self._purl_parsed:
+            purl_str = self.data.get("purl")
+            self._purl = merge.try_parse_purl(purl_str) if purl_str else None
+            self._purl_parsed = True
+        return self._purl
     
     def unwrap(self) -> dict[str,Any]:
         return self.data 
@@ -36,29 +96,51 @@ def wrap_as_element(items: Iterable[dict[str, Any]]) -> list[SBOMElement]:
     """
     Wrap a list of dictionary elements into SBOMElement objects.
     """
-    return list(map(SBOMElement, items))
+    return [SBOMElement(data=item) for item in items]
 
-def purl_without_version(purl: PackageURL): 
-    purl = purl._replace(version=None)
-    return purl
+def _purl_key(purl: PackageURL) -> tuple[str, str | None, str]:
+    """
+    Get the versionless key used to match components between SBOMs.
+    """
+    return (purl.type, purl.namespace, purl.name)
 
-def all_purls(sbom: Sequence[SBOMItem]):
-    all_purls = {}
-    for index, component in enumerate(sbom):
-        all_purls[purl_without_version(component.purl())] = index
-    return all_purls
+def _item_purls(item: SBOMItem) -> list[PackageURL]:
+    """
+    Get all Package URLs of an SBOM item. SPDX packages may carry more
+    than one purl, in which case all of them are returned.
+    """
+    if isinstance(item, SPDXPackage):
+        return item.all_purls()
+    purl = item.purl()
+    return [purl] if purl else []
+
+def build_purl_index(
+    sbom: Sequence[SBOMItem],
+) -> dict[tuple[str, str | None, str], int]:
+    """
+    Map the versionless purl key of every item in an SBOM to its index.
+    Items without a purl are left out.
+    """
+    return {
+        _purl_key(purl): index
+        for index, component in enumerate(sbom)
+        for purl in _item_purls(component)
+    }
 
 def general_enrich(enrichFunc, target_sbom: Sequence[SBOMItem], incoming_sbom: Sequence[SBOMItem]):
-        target_purls = all_purls(target_sbom)
+        target_purls = build_purl_index(target_sbom)
         
         target_packages = [component.unwrap() for component in target_sbom]
         for element in incoming_sbom: 
-            if purl_without_version(element.purl()) in target_purls:
-                index = target_purls[purl_without_version(element.purl())]
-                component_to_enrich = target_sbom[index]
-                newPackage = enrichFunc(component_to_enrich.unwrap(), element.unwrap())
-                if newPackage: 
-                    target_packages[index] = newPackage 
+            purl = element.purl()
+            if purl is None:
+                continue
+            index = target_purls.get(_purl_key(purl))
+            if index is None:
+                continue
+            newPackage = enrichFunc(target_packages[index], element.unwrap())
+            if newPackage: 
+                target_packages[index] = newPackage 
         return target_packages
 
 
@@ -69,6 +151,7 @@ class SBOMEnricher(ABC):
         self,
         target_sbom: dict[str, Any],
         incoming_sbom: dict[str, Any],
+        incoming_type: SBOMType | None,
     ) -> dict[str, Any]:  # pragma: no cover
         """
         Enrich two SBOMs.
@@ -76,6 +159,7 @@ class SBOMEnricher(ABC):
         Args:
             target_sbom: The SBOM to enrich
             incoming_sbom: The SBOM to extract fields from and add to the target_sbom
+            incoming_type: The format of the incoming_sbom, None if it is not an SBOM
         Returns:
             dict[str, Any]: The enriched SBOM
         """
@@ -87,34 +171,49 @@ class CycloneDXEnricher(SBOMEnricher):  # pylint: disable=too-few-public-methods
     Enrich class for CycloneDX SBOMs.
     """
 
-    def enrich(self, target_sbom: dict[str, Any], incoming_sbom: dict[str, Any]) -> dict[str, Any]:
+    def enrich(
+        self,
+        target_sbom: dict[str, Any],
+        incoming_sbom: dict[str, Any],
+        incoming_type: SBOMType | None,
+    ) -> dict[str, Any]:
         """
         Enrich a CycloneDX SBOM with an SBOM of any type
 
         Args:
             target_sbom: The SBOM to enrich
             incoming_sbom: The SBOM to extract fields from and add to the target_sbom
+            incoming_type: The format of the incoming_sbom, None if it is not an SBOM
 
         Returns:
             dict[str, Any]: The enriched SBOM
         """
         target_components = merge.wrap_as_cdx(target_sbom["components"])
-        try:
-            if merge._detect_sbom_type(incoming_sbom) == "cyclonedx":
-                incoming_components = merge.wrap_as_cdx(incoming_sbom["components"])
-                target_sbom["components"] = general_enrich(self.mergeModelCards,target_components, incoming_components)
-            else: 
-                incoming_packages = merge.wrap_as_spdx(incoming_sbom["packages"])
-                target_sbom["components"] = self.enrich_from_spdx(target_sbom, incoming_packages)
-        except ValueError as e: 
-            print(f"{e}, treating enrichment file as json")
+        if incoming_type is SBOMType.CYCLONEDX:
+            incoming_components = merge.wrap_as_cdx(incoming_sbom["components"])
+            target_sbom["components"] = general_enrich(
+                self.mergeModelCards, target_components, incoming_components
+            )
+        elif incoming_type is SBOMType.SPDX:
+            incoming_packages = merge.wrap_as_spdx(incoming_sbom["packages"])
+            target_sbom["components"] = self.enrich_from_spdx(
+                target_components, incoming_packages
+            )
+        else:
+            LOGGER.info("Unknown SBOM format, treating enrichment file as json")
             incoming_elements = wrap_as_element(incoming_sbom["components"])
-            target_sbom["components"] = general_enrich(self.convertToModelCard,target_components, incoming_elements)
+            target_sbom["components"] = general_enrich(
+                self.convertToModelCard, target_components, incoming_elements
+            )
         
         return target_sbom
                 
            
-    def enrich_from_spdx(self, target_sbom: Sequence[CDXComponent], incoming_sbom: Sequence[SPDXPackage]) -> dict[str, Any]:
+    def enrich_from_spdx(
+        self,
+        target_sbom: Sequence[CDXComponent],
+        incoming_sbom: Sequence[SPDXPackage],
+    ) -> list[dict[str, Any]]:
         raise NotImplementedError("TODO: implement this")
 
 
@@ -123,7 +222,6 @@ class CycloneDXEnricher(SBOMEnricher):  # pylint: disable=too-few-public-methods
         This is intended for when the incoming component is a json file, not an sbom. 
         We can convert the incoming fields to a model card format, then pass it in the mergeModelCards func
         '''
-        print("HERE!!")
         incoming_component["modelCard"] = {
             "modelParameters": {},
             "properties": incoming_component["data"]
@@ -140,24 +238,23 @@ class CycloneDXEnricher(SBOMEnricher):  # pylint: disable=too-few-public-methods
         #TODO: should probably also be adding on to the modelParameters?
         newModelCard["modelParameters"] = incoming_component["modelCard"]["modelParameters"]
         
-        if "modelCard" in incoming_component: 
-            '''
-            parts of a modelCard:
-            modelParameters
-                - architectureFamily
-                - inputs: [{format: value}]
-                - modelArchitecture
-                - outputs: [{format: value}]
-                - task
-            properties:
-                - {name : value}
-            '''
-            newProperties = [] if not "properties" in newModelCard else newModelCard["properties"]
-            targetProperties = incoming_component["modelCard"]["properties"]
-            #add everything from incoming properties that isn't already in the target properties
-            [p for p in newProperties if not p in targetProperties]
-            newModelCard["properties"] = newProperties + [p for p in newProperties if not p in targetProperties]
-
+        # parts of a modelCard:
+        # modelParameters
+        #     - architectureFamily
+        #     - inputs: [{format: value}]
+        #     - modelArchitecture
+        #     - outputs: [{format: value}]
+        #     - task
+        # properties:
+        #     - {name : value}
+        newProperties = newModelCard.get("properties", [])
+        targetProperties = incoming_component["modelCard"]["properties"]
+        # add every incoming property that isn't already in the target properties
+        existing_names = {p["name"] for p in newProperties}
+        newProperties.extend(
+            p for p in targetProperties if p["name"] not in existing_names
+        )
+        newModelCard["properties"] = newProperties
 
         target_component["modelCard"] = newModelCard
         return target_component
@@ -168,19 +265,27 @@ class SPDXEnricher(SBOMEnricher):  # pylint: disable=too-few-public-methods
     Enrich class for SPDX SBOMs.
     """
 
-    def enrich(self, target_sbom: dict[str, Any], incoming_sbom: dict[str, Any]) -> dict[str, Any]:
+    def enrich(
+        self,
+        target_sbom: dict[str, Any],
+        incoming_sbom: dict[str, Any],
+        incoming_type: SBOMType | None,
+    ) -> dict[str, Any]:
         """
         Enrich a SPDX SBOM with an SBOM of any type
 
         Args:
             target_sbom: The SBOM to enrich
             incoming_sbom: The SBOM to extract fields from and add to the target_sbom
+            incoming_type: The format of the incoming_sbom, None if it is not an SBOM
 
         Returns:
             dict[str, Any]: The enriched SBOM
         """
-        target_packages = merge.wrap_as_spdx(target_sbom.get("packages", []))
-        if merge._detect_sbom_type(incoming_sbom) == "cyclonedx":
+        if incoming_type is None:
+            raise ValueError("Unknown SBOM format")
+        if incoming_type is SBOMType.CYCLONEDX:
+            target_packages = merge.wrap_as_spdx(target_sbom.get("packages", []))
             target_sbom["creationInfo"] = self.addToTools(target_sbom["creationInfo"], incoming_sbom["metadata"]["tools"])
             target_sbom["packages"] = general_enrich(self.enrichPackage, target_packages, merge.wrap_as_cdx(incoming_sbom.get("components", [])))
             return target_sbom
@@ -192,41 +297,45 @@ class SPDXEnricher(SBOMEnricher):  # pylint: disable=too-few-public-methods
         
     
     def addToTools(self, creationInfo: dict[str,Any], tools: dict[str,Any]):
-        for component in tools["components"]:
-            creationInfo["creators"].append(f"Tool: {component["name"]}")
+        creationInfo["creators"].extend(
+            f"Tool: {c['name']}" for c in tools["components"]
+        )
         return creationInfo
     def enrichPackage(self, package: dict[str,Any], component: dict[str,Any]):
         
         if "modelCard" in component:
             modelCard = component["modelCard"]
             annotations = []
+            now_iso = datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
             
-            for field in modelCard['properties']:
-                fieldName, fieldValue = field['name'], field['value']
+            for prop in modelCard['properties']:
+                fieldName, fieldValue = prop['name'], prop['value']
 
-                #bomFormat doesn't go in SPDX and serialNumber gets rebuilt as the SPDX id
-                #specversion doesn't matter because we're using the SPDX version of the original
-                prefer_original = ['bomFormat', 'serialNumber', 'specVersion', 'external_references', 'downloadLocation', 'version']
-                if fieldName in prefer_original:
+                if fieldName in _PREFER_ORIGINAL_FIELDS:
                     continue
 
-                script_path = Path(__file__).resolve()
-                script_dir = script_path.parent
-                
-                spdxFieldName = self.getFieldName(f"{script_dir}/enrich_tools/SPDXmappings2.3.json", fieldName)
+                spdxFieldName = self.getFieldName(_SPDX_MAP_PATH, fieldName)
                 #don't overwrite the field if its in the original SBOM, but add it in if its not
                 if spdxFieldName and not (fieldName in package):
                     package[spdxFieldName] = fieldValue 
                     continue 
 
                 
-                spdxAIFieldName = self.getFieldName(f"{script_dir}/enrich_tools/SPDXmappingAI.json", fieldName)
+                spdxAIFieldName = self.getFieldName(_SPDX_AI_MAP_PATH, fieldName)
                 if spdxAIFieldName:   
-                    self.makeAnnotationFromField(spdxAIFieldName, fieldValue) 
-                    annotations.append(self.makeAnnotationFromField(spdxAIFieldName, fieldValue))
+                    annotations.append(
+                        self.makeAnnotationFromField(
+                            spdxAIFieldName, fieldValue, now_iso
+                        )
+                    )
                     continue 
 
-                print(f"The field {fieldName} does not correspond to any SPDX field or AI field. Skipping over field {field}")
+                LOGGER.debug(
+                    "The field %s does not correspond to any SPDX field or AI "
+                    "field. Skipping over field %s",
+                    fieldName,
+                    prop,
+                )
 
             package["annotations"].extend(annotations)
 
@@ -234,67 +343,105 @@ class SPDXEnricher(SBOMEnricher):  # pylint: disable=too-few-public-methods
         return package
         
     
-    def makeAnnotationFromField(self, field, value):
-        annotation = {"annotationDate": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
-                      "annotationType" : "OTHER",
-                      "annotator": "Tool: OWASP AIBOM Generator",
-                      "comment" : f"{field} : {value}"}
-        return annotation 
+    def makeAnnotationFromField(
+        self, field_name: str, value: Any, now_iso: str
+    ) -> dict[str, str]:
+        return {"annotationDate": now_iso,
+                "annotationType" : "OTHER",
+                "annotator": "Tool: OWASP AIBOM Generator",
+                "comment" : f"{field_name} : {value}"}
     
-    def getFieldName(self, file_path, fieldName):
-        try:
-            with open(file_path, 'r') as f:
-                mappings = json.load(f)
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            raise e
-        if fieldName in mappings:
-            return  mappings[fieldName]['SPDX_Equivalent']
-        return None
+    def getFieldName(self, file_path: str, fieldName: str) -> str | None:
+        """
+        Look up the SPDX equivalent of a field in a mapping file.
+        """
+        mapping = _load_mapping(file_path).get(fieldName, {})
+        return mapping.get("SPDX_Equivalent")  # type: ignore[no-any-return]
+
 
 
 
+def _detect_incoming_type(sbom: dict[str, Any]) -> SBOMType | None:
+    """
+    Detects the type of the incoming SBOM. Returns None if the document
+    is not a known SBOM format, e.g. a plain JSON enrichment file.
+    """
+    try:
+        return SBOMType(merge._detect_sbom_type(sbom))
+    except ValueError:
+        return None
+
 
 def _create_enricher(
-    target_sbom: dict[str, Any]
+    target_type: SBOMType
 ) -> SBOMEnricher:
     """
-    Creates a merger for the given SBOMs.
+    Creates an enricher for the given target SBOM type.
     """
-    target_type = merge._detect_sbom_type(target_sbom)
-
-    if target_type == "cyclonedx":
+    if target_type is SBOMType.CYCLONEDX:
         return CycloneDXEnricher()
 
     return SPDXEnricher() 
 
+def enrich_sbom_from_objs(
+    target_sbom: dict[str, Any], incoming_sbom: dict[str, Any]
+) -> dict[str, Any]:
+    """
+    Enrich an already loaded SBOM with the fields of another loaded document.
+
+    The target SBOM is modified in place.
+
+    Args:
+        target_sbom: The SBOM to enrich
+        incoming_sbom: The SBOM or JSON enrichment document to extract fields from
+
+    Returns:
+        The enriched SBOM
+
+    Raises:
+        ValueError: If the target SBOM is not a known SBOM format
+    """
+    target_type = SBOMType(merge._detect_sbom_type(target_sbom))
+    incoming_type = _detect_incoming_type(incoming_sbom)
+    #we only need the type of the target SBOM to create the enricher
+    enricher = _create_enricher(target_type)
+    return enricher.enrich(target_sbom, incoming_sbom, incoming_type)
+
+
+async def _load_sbom(sbom: Path | dict[str, Any]) -> dict[str, Any]:
+    """
+    Load an SBOM from a path, or return it as is if it is already loaded.
+    """
+    if isinstance(sbom, dict):
+        return sbom
+    return await merge.load_sbom_from_json(sbom)
+
+
 async def enrich_sbom(
-    target_sbom: Path, incoming_sbom: Path | None = None
+    target_sbom: Path | dict[str, Any],
+    incoming_sbom: Path | dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     """
-    Merge multiple SBOMs.
+    Enrich an SBOM.
 
-    This is the main entrypoint function for merging SBOMs.
-    Currently supports merging multiple Syft SBOMs with up to
-    1 Hermeto SBOM.
+    This is the main entrypoint function for enriching SBOMs.
 
     Args:
-        syft_sbom_paths: List of paths to Syft SBOMs
-        hermeto_sbom_path: Optional path to Hermeto SBOM
+        target_sbom: The SBOM to enrich, as a path or an already loaded dict
+        incoming_sbom: The SBOM or JSON enrichment document to extract fields
+            from, as a path or an already loaded dict
 
     Returns:
-        The merged SBOM
+        The enriched SBOM
 
     Raises:
-        ValueError: If there are not enough SBOMs to merge (at least
-        one Syft SBOM with Hermeto SBOM, or multiple Syft SBOMs)
+        ValueError: If either SBOM is missing or the target SBOM is not a
+        known SBOM format
     """
 
     if not target_sbom or not incoming_sbom:
         raise ValueError("A target SBOM path and an incoming SBOM is required to enrich an SBOM.")
     
-    target_sbom_loaded = await merge.load_sbom_from_json(target_sbom)
-    incoming_sbom_loaded = await merge.load_sbom_from_json(incoming_sbom)
-    #we only need the type of the target SBOM to create the enricher
-    enricher = _create_enricher(target_sbom_loaded)
-    return enricher.enrich(target_sbom_loaded, incoming_sbom_loaded)
\ No newline at end of file
+    target_sbom_loaded = await _load_sbom(target_sbom)
+    incoming_sbom_loaded = await _load_sbom(incoming_sbom)
+    return enrich_sbom_from_objs(target_sbom_loaded, incoming_sbom_loaded)
@@ -38,6 +38,8 @@ class SBOMItem(ABC):
     Methods are defined to be overridden by subclasses.
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def id(self) -> str:
         """Get the ID of the SBOM item."""
@@ -10,6 +10,8 @@ from json import JSONDecodeError
 from pathlib import Path
 from typing import Any
 
+import aiofiles
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -109,14 +111,14 @@ async def load_sbom_from_json(file_path: Path) -> dict[str, Any]:
     Returns:
         The SBOM dictionary from the file.
     """
-    with open(file_path, encoding="utf-8") as in_stream:
-        try:
-            contents = in_stream.read()
-            return json.loads(contents)  # type: ignore[no-any-return]
-        except JSONDecodeError:
-            LOGGER.critical(
-                "Expected a JSON SBOM. Found different file contents! "
-                "Logging first 200 chars of the file."
-            )
-            LOGGER.critical(contents[:200])
-            raise
+    async with aiofiles.open(file_path, "rb") as in_stream:
+        contents = await in_stream.read()
+    try:
+        return json.loads(contents)  # type: ignore[no-any-return]
+    except JSONDecodeError:
+        LOGGER.critical(
+            "Expected a JSON SBOM. Found different file contents! "
+            "Logging first 200 chars of the file."
+        )
+        LOGGER.critical(contents[:200].decode("utf-8", errors="replace"))
+        raise
@@ -0,0 +1,44 @@
+import json
+from collections.abc import Callable, Generator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+ENRICHED_PATHS = pytest.StashKey[list[Path]]()
+
+
+@pytest.fixture
+def enriched_output(
+    request: pytest.FixtureRequest, tmp_path: Path
+) -> Callable[[str], Path]:
+    """
+    Get the output path for an enriched SBOM of a given case. The paths are
+    stashed on the test item so that outputs of failed tests can be
+    pretty-printed for inspection.
+    """
+    paths = request.node.stash.setdefault(ENRICHED_PATHS, [])
+
+    def _path(case: str) -> Path:
+        path = tmp_path / f"enriched_sbom_{case}.json"
+        paths.append(path)
+        return path
+
+    return _path
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo[Any]
+) -> Generator[None, pytest.TestReport, pytest.TestReport]:
+    """
+    Indent the enriched SBOM outputs of a failed test, so that only failures
+    pay for pretty-printing. Skipped and xfailed tests are left alone.
+    """
+    report = yield
+    if report.when != "call" or not report.failed:
+        return report
+    for path in item.stash.get(ENRICHED_PATHS, []):
+        if path.exists():
+            path.write_text(json.dumps(json.loads(path.read_bytes()), indent=2))
+    return report
@@ -1,77 +1,225 @@
-from mobster.sbom.enrich import enrich_sbom
-from pathlib import Path
 import asyncio
 import json
+import os
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
 
+import aiofiles
 import pytest
+from packageurl import PackageURL
+
+from mobster.sbom.enrich import (
+    CycloneDXEnricher,
+    SBOMElement,
+    build_purl_index,
+    enrich_sbom,
+    enrich_sbom_from_objs,
+    general_enrich,
+)
+from mobster.sbom.merge import wrap_as_cdx, wrap_as_spdx
+
+TESTDATA_PATH = Path(__file__).parent / "test_enrich_data"
+
+# set MOBSTER_TEST_PRETTY=1 to indent the enriched output for inspection
+PRETTY_OUTPUT = os.getenv("MOBSTER_TEST_PRETTY") == "1"
+
+
+async def _dump(path: Path, obj: dict[str, Any]) -> None:
+    """
+    Write an enriched SBOM to a file in a single write. Encoding runs in a
+    worker thread, so the event loop is not blocked while it runs.
+    """
+    payload = await asyncio.to_thread(
+        json.dumps, obj, indent=2 if PRETTY_OUTPUT else None
+    )
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(payload.encode("utf-8"))
+
+
+@pytest.fixture(scope="session")
+def load_sbom() -> Callable[[Path], dict[str, Any]]:
+    """
+    Load a test SBOM. Each file is read from disk once per session, but a
+    freshly parsed document is returned on every call because enrichment
+    modifies the target SBOM in place.
+    """
+    contents: dict[Path, bytes] = {}
+
+    def _load(path: Path) -> dict[str, Any]:
+        if path not in contents:
+            contents[path] = path.read_bytes()
+        return json.loads(contents[path])  # type: ignore[no-any-return]
 
-@pytest.fixture
-def data_dir() -> Path:
-    """Path to the directory for storing SBOM sample test data."""
-    return Path(__file__).parent / "test_enrich_data"
+    return _load
 
+
+CASES = [
+    (
+        TESTDATA_PATH / "llm_compress_spdx.json",
+        TESTDATA_PATH / "TinyLlama_TinyLlama-1.1B-Chat-v1.0_aibom.json",
+        "spdx-cdx",
+    ),
+    (
+        TESTDATA_PATH / "original_gemma.json",
+        TESTDATA_PATH / "gemma_owasp.json",
+        "cdx-cdx",
+    ),
+    (
+        TESTDATA_PATH / "mock_cdx.json",
+        TESTDATA_PATH / "mock_enrichment_format.json",
+        "cdx-json",
+    ),
+]
+
+
+OWASP_ANNOTATOR = "Tool: OWASP AIBOM Generator"
+
+
+def _assert_enriched(new_sbom: dict[str, Any]) -> None:
+    """Check that at least one item of the target SBOM was enriched."""
+    if "packages" in new_sbom:
+        assert any(
+            annotation["annotator"] == OWASP_ANNOTATOR
+            for package in new_sbom["packages"]
+            for annotation in package.get("annotations", [])
+        )
+    else:
+        assert any("modelCard" in component for component in new_sbom["components"])
+
+
+@pytest.mark.fail_slow("2s")
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "original_sbom, owasp_sbom",
-    [
-        (Path("llm_compress_spdx.json"), Path("TinyLlama_TinyLlama-1.1B-Chat-v1.0_aibom.json")),
-    ],
-)
+async def test_enrich_all(enriched_output: Callable[[str], Path]) -> None:
+    # pass paths, so that the aiofiles loads of all cases overlap
+    results = await asyncio.gather(
+        *[
+            enrich_sbom(original_sbom, incoming_sbom)
+            for original_sbom, incoming_sbom, _ in CASES
+        ]
+    )
+    for (_, _, case), new_sbom in zip(CASES, results, strict=True):
+        await _dump(enriched_output(case), new_sbom)
+        _assert_enriched(new_sbom)
 
-async def test_enrich_sboms_spdx_cdx(
-    original_sbom: Path,
-    owasp_sbom:Path,
-    data_dir: Path,
-    monkeypatch: pytest.MonkeyPatch,     
-):
-    monkeypatch.chdir(data_dir)
-    original_sbom_path = data_dir / original_sbom
-    owasp_sbom_path = data_dir / owasp_sbom
-
-    
-    new_sbom = await enrich_sbom(original_sbom_path, owasp_sbom_path)
-    with open('enriched_sbom.json', 'w') as f:
-        json.dump(new_sbom, f, indent=2)
 
+@pytest.mark.slow
+@pytest.mark.fail_slow("2s")
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
-    "gemma_cdx, owasp_gemma_sbom",
-    [
-        (Path("original_gemma.json"), Path("gemma_owasp.json")),
-    ],
+    "original_sbom, incoming_sbom, case", CASES, ids=[c[2] for c in CASES]
 )
-async def test_enrich_sboms_cdx_cdx(
-    gemma_cdx: Path,
-    owasp_gemma_sbom:Path,
-    data_dir: Path,
-    monkeypatch: pytest.MonkeyPatch,     
-):
-    monkeypatch.chdir(data_dir)
-    original_sbom_path = data_dir / gemma_cdx
-    owasp_sbom_path = data_dir / owasp_gemma_sbom
-    
-    new_sbom = await enrich_sbom(original_sbom_path, owasp_sbom_path)
-    with open('enriched_sbom_gemma.json', 'w') as f:
-        json.dump(new_sbom, f, indent=2)
+async def test_enrich_sbom(
+    original_sbom: Path,
+    incoming_sbom: Path,
+    case: str,
+    enriched_output: Callable[[str], Path],
+    load_sbom: Callable[[Path], dict[str, Any]],
+) -> None:
+    new_sbom = enrich_sbom_from_objs(load_sbom(original_sbom), load_sbom(incoming_sbom))
+    await _dump(enriched_output(case), new_sbom)
+    _assert_enriched(new_sbom)
+
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "mock_cdx, mock",
-    [
-        (Path("mock_cdx.json"), Path("mock_enrichment_format.json")),
-    ],
-)
-async def test_enrich_sboms_cdx_json(
-    mock_cdx: Path,
-    mock:Path,
-    data_dir: Path,
-    monkeypatch: pytest.MonkeyPatch,     
-):
-    monkeypatch.chdir(data_dir)
-    original_sbom_path = data_dir / mock_cdx
-    owasp_sbom_path = data_dir / mock
-    
-    new_sbom = await enrich_sbom(original_sbom_path, owasp_sbom_path)
-    with open('enriched_sbom_mock.json', 'w') as f:
-        json.dump(new_sbom, f, indent=2)
+async def test_enrich_sbom_spdx_with_json_is_unsupported() -> None:
+    with pytest.raises(ValueError, match="Unknown SBOM format"):
+        await enrich_sbom(
+            TESTDATA_PATH / "llm_compress_spdx.json",
+            TESTDATA_PATH / "mock_enrichment_format.json",
+        )
+
+
+def test_SBOMElement() -> None:
+    element = SBOMElement({"name": "tinyllama", "purl": "pkg:huggingface/tinyllama@1"})
+
+    assert element.id() == ""
+    assert element.name() == "tinyllama"
+    assert element.version() == ""
+    assert element.purl() == PackageURL.from_string("pkg:huggingface/tinyllama@1")
+    assert element.purl() is element.purl()
+    assert SBOMElement({"name": "no-purl"}).purl() is None
+
+
+def test_build_purl_index_indexes_every_spdx_purl() -> None:
+    packages = wrap_as_spdx(
+        [
+            {
+                "SPDXID": "SPDXRef-a",
+                "name": "a",
+                "externalRefs": [
+                    {"referenceType": "purl", "referenceLocator": "pkg:pypi/a@1.0"},
+                    {"referenceType": "purl", "referenceLocator": "pkg:generic/a@1.0"},
+                ],
+            },
+            {"SPDXID": "SPDXRef-b", "name": "b"},
+            {
+                "SPDXID": "SPDXRef-c",
+                "name": "c",
+                "externalRefs": [
+                    {"referenceType": "purl", "referenceLocator": "pkg:npm/%40ns/c@2"},
+                ],
+            },
+        ]
+    )
+
+    assert build_purl_index(packages) == {
+        ("pypi", None, "a"): 0,
+        ("generic", None, "a"): 0,
+        ("npm", "@ns", "c"): 2,
+    }
+
+
+def test_general_enrich_skips_unmatched_elements() -> None:
+    targets = [{"name": "a", "purl": "pkg:pypi/a@1.0"}]
+    incoming = [
+        SBOMElement({"name": "no-purl"}),
+        SBOMElement({"name": "other", "purl": "pkg:pypi/other@1.0"}),
+    ]
+
+    def _enrich(target: dict[str, Any], element: dict[str, Any]) -> dict[str, Any]:
+        raise AssertionError("enrichFunc must not be called")
+
+    result = general_enrich(_enrich, wrap_as_cdx(targets), incoming)
+
+    assert result == [{"name": "a", "purl": "pkg:pypi/a@1.0"}]
+
+
+def test_mergeModelCards_adds_missing_properties() -> None:
+    target = {
+        "modelCard": {
+            "modelParameters": {},
+            "properties": [
+                {"name": "license", "value": "mit"},
+                {"name": "domain", "value": "nlp"},
+            ],
+        }
+    }
+    incoming = {
+        "modelCard": {
+            "modelParameters": {"task": "text-generation"},
+            "properties": [
+                {"name": "license", "value": "apache-2.0"},
+                {"name": "energyConsumption", "value": "low"},
+            ],
+        }
+    }
+
+    merged = CycloneDXEnricher().mergeModelCards(target, incoming)
+
+    assert merged["modelCard"]["modelParameters"] == {"task": "text-generation"}
+    assert merged["modelCard"]["properties"] == [
+        {"name": "license", "value": "mit"},
+        {"name": "domain", "value": "nlp"},
+        {"name": "energyConsumption", "value": "low"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_enrich_sbom_from_paths() -> None:
+    original_sbom, incoming_sbom, _ = CASES[0]
+
+    new_sbom = await enrich_sbom(original_sbom, incoming_sbom)
 
+    _assert_enriched(new_sbom)
+    assert OWASP_ANNOTATOR in new_sbom["creationInfo"]["creators"]
@@ -30,27 +30,27 @@ def test_normalize_file_name() -> None:
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize(["fail"], [(True,), (False,)])
-@patch("mobster.utils.open")
+@patch("mobster.utils.aiofiles.open")
 @patch("mobster.utils.json")
 async def test_load_sbom_from_json(
     mock_json: MagicMock, mock_open: MagicMock, fail: bool, caplog: LogCaptureFixture
 ) -> None:
-    mock_stream = MagicMock()
-    mock_stream.read.return_value = "foo"
-    mock_open.return_value.__enter__.return_value = mock_stream
+    mock_stream = AsyncMock()
+    mock_stream.read.return_value = b"foo"
+    mock_open.return_value.__aenter__.return_value = mock_stream
 
     if fail:
         mock_json.loads.side_effect = JSONDecodeError("a", "b", 1)
         with pytest.raises(JSONDecodeError):
             await load_sbom_from_json(MagicMock())
-            assert (
-                "Expected a JSON SBOM. Found different file contents!"
-                in caplog.messages
-            )
-            assert "foo" in caplog.messages
+        assert (
+            "Expected a JSON SBOM. Found different file contents! "
+            "Logging first 200 chars of the file." in caplog.messages
+        )
+        assert "foo" in caplog.messages
     else:
         await load_sbom_from_json(MagicMock())
-        mock_json.loads.assert_called_once_with("foo")
+        mock_json.loads.assert_called_once_with(b"foo")
 
 
 @pytest.mark.asyncio